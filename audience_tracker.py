@@ -2,21 +2,40 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from pathlib import Path
+import hashlib
+import hmac
 import json
+import io
+import pickle
+
+# Per-user workspaces are persisted here so they survive app restarts
+DATA_DIR = Path("data")
 
 # Page configuration
 st.set_page_config(page_title="Audience Tracker", page_icon="📊", layout="wide")
 
-# Team Members Authentication
+# Team Members Authentication - keyed blake2b digests of the passwords,
+# verified in constant time (no plaintext in source)
+AUTH_KEY = b"audience-tracker-auth-v1"
+
 USERS = {
-    "admin": "password123",
-    "Alaa": "alaa123",
-    "Ashley": "beyonce101",
-    "Flora": "truffle",
-    "Tom": "excel101",
-    "Sebastian": "databricks101",
+    "admin": bytes.fromhex("6750f646b865b4155c76f48927c4b315"),
+    "Alaa": bytes.fromhex("50c4b2415db242beb3fc78cca8ec2daa"),
+    "Ashley": bytes.fromhex("72a763faa47f0e9729da31062f117969"),
+    "Flora": bytes.fromhex("e8014f58d84dc5097a4823f8c590e87d"),
+    "Tom": bytes.fromhex("b930b2c472e668d5ecdf88a5d5df6be7"),
+    "Sebastian": bytes.fromhex("c287f41dc72484550e8acd720b45e974"),
 }
 
+# Built once at import - login_page reruns on every keystroke
+USER_NAMES = tuple(USERS)
+
+def check_password(username, password):
+    """Constant-time password check against the stored digest"""
+    digest = hashlib.blake2b(password.encode(), key=AUTH_KEY, digest_size=16).digest()
+    return hmac.compare_digest(digest, USERS.get(username, b""))
+
 # Initialize session state
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
@@ -24,16 +43,33 @@ if 'username' not in st.session_state:
     st.session_state.username = ""
 if 'user_data' not in st.session_state:
     # Store data separately for each user
-    st.session_state.user_data = {user: {'upload_history': [], 'audience_dict': {}} for user in USERS.keys()}
+    st.session_state.user_data = {user: {'upload_history': [], 'audience_dict': {}, 'latest_dict': {}, 'first_seen': {}, 'last_seen': {}} for user in USERS.keys()}
 
 def get_user_data():
     """Get current user's data"""
     return st.session_state.user_data[st.session_state.username]
 
+def save_user_data(username):
+    """Persist a user's workspace to disk"""
+    DATA_DIR.mkdir(exist_ok=True)
+    content = pickle.dumps(st.session_state.user_data[username], protocol=pickle.HIGHEST_PROTOCOL)
+    (DATA_DIR / f"{username}.pkl").write_bytes(content)
+
+def load_user_data(username):
+    """Load a user's workspace from disk (called once, at login)"""
+    path = DATA_DIR / f"{username}.pkl"
+    if path.exists():
+        try:
+            st.session_state.user_data[username] = pickle.loads(path.read_bytes())
+        except Exception:
+            # Unreadable/stale file - keep the in-memory default
+            pass
+
 def update_user_data(upload_history, audience_dict):
     """Update current user's data"""
     st.session_state.user_data[st.session_state.username]['upload_history'] = upload_history
     st.session_state.user_data[st.session_state.username]['audience_dict'] = audience_dict
+    save_user_data(st.session_state.username)
 
 def login_page():
     st.title("🔐 Audience Data Tracker - Login")
@@ -44,106 +80,328 @@ def login_page():
         st.markdown("---")
         username = st.selectbox(
             "Select Your Name",
-            options=list(USERS.keys()),
+            options=USER_NAMES,
             key="login_username"
         )
         password = st.text_input("Password", type="password", key="login_password")
         
         if st.button("Login", use_container_width=True):
-            if username in USERS and USERS[username] == password:
+            if check_password(username, password):
                 st.session_state.logged_in = True
                 st.session_state.username = username
+                load_user_data(username)
                 st.rerun()
             else:
                 st.error("Invalid password")
         
         st.markdown("---")
 
+def _format_dates(series):
+    """Batch-format a date column to YYYY-MM-DD strings ('' for missing)"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime('%Y-%m-%d').fillna('').to_numpy()
+
+    # Column didn't parse as dates - fall back to plain strings
+    return series.astype(str).where(series.notna(), '').to_numpy()
+
+MISSING_NAME_ERROR = "Could not find 'Audience Name' column. Please make sure your Excel file has a column named 'Audience Name'"
+
+def _match_columns(columns):
+    """Match raw header values to the fields we need (strip whitespace,
+    case-insensitive matching)"""
+    col_mapping = {}
+    for col in columns:
+        if col is None:
+            continue
+        col_lower = str(col).strip().lower()
+        if 'audience name' in col_lower or col_lower == 'name':
+            col_mapping['audience_name'] = col
+        elif 'audience size' in col_lower or col_lower == 'size':
+            col_mapping['audience_size'] = col
+        elif 'creation date' in col_lower or 'created' in col_lower:
+            col_mapping['creation_date'] = col
+        elif 'refresh date' in col_lower or 'refreshed' in col_lower:
+            col_mapping['refresh_date'] = col
+
+    return col_mapping
+
+def _format_cell_date(value):
+    """Format a single cell value to YYYY-MM-DD ('' for missing)"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+def _parse_with_openpyxl(content):
+    """Stream an .xlsx workbook row by row, skipping pandas entirely.
+
+    openpyxl's read-only mode never materializes the whole sheet, so memory
+    stays around the file size and the dict is built in a single pass.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        rows = ws.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if headers is None:
+            raise ValueError(MISSING_NAME_ERROR)
+
+        col_mapping = _match_columns(headers)
+        if 'audience_name' not in col_mapping:
+            raise ValueError(MISSING_NAME_ERROR)
+
+        idx = {header: i for i, header in enumerate(headers) if header is not None}
+
+        # Resolve the mapped headers to column positions once, outside the
+        # row loop
+        name_idx = idx[col_mapping['audience_name']]
+        size_idx = idx[col_mapping['audience_size']] if 'audience_size' in col_mapping else None
+        cdate_idx = idx[col_mapping['creation_date']] if 'creation_date' in col_mapping else None
+        rdate_idx = idx[col_mapping['refresh_date']] if 'refresh_date' in col_mapping else None
+
+        audience_dict = {}
+        preview_rows = []
+        total_rows = 0
+        for row in rows:
+            total_rows += 1
+            if total_rows <= 3:
+                preview_rows.append(row)
+
+            name = row[name_idx]
+            if name is None:
+                continue
+
+            size = row[size_idx] if size_idx is not None else 0
+            try:
+                size = int(size)
+            except (TypeError, ValueError):
+                size = 0
+
+            cdate = row[cdate_idx] if cdate_idx is not None else None
+            rdate = row[rdate_idx] if rdate_idx is not None else None
+
+            audience_dict[str(name)] = {
+                'audienceSize': size,
+                'creationDate': _format_cell_date(cdate),
+                'refreshDate': _format_cell_date(rdate)
+            }
+    finally:
+        wb.close()
+
+    info = {
+        'total_rows': total_rows,
+        'columns': [header for header in headers if header is not None],
+        'col_mapping': col_mapping,
+        'preview': pd.DataFrame(preview_rows, columns=headers)
+    }
+
+    return audience_dict, info
+
+def _parse_with_pandas(content, engine):
+    """Load the mapped columns through pd.read_excel and vectorize the
+    dict construction"""
+    # Cheap header-only probe - match columns before loading any rows
+    buffer = io.BytesIO(content)
+    header_df = pd.read_excel(buffer, nrows=0, engine=engine)
+
+    col_mapping = _match_columns(header_df.columns)
+
+    # Check if we found the audience name column
+    if 'audience_name' not in col_mapping:
+        raise ValueError(MISSING_NAME_ERROR)
+
+    # Re-read only the mapped columns with proper dtypes
+    dtype = {col_mapping['audience_name']: 'string'}
+    if 'audience_size' in col_mapping:
+        dtype[col_mapping['audience_size']] = 'Int64'
+    date_cols = [col_mapping[key] for key in ('creation_date', 'refresh_date') if key in col_mapping]
+
+    buffer.seek(0)
+    df = pd.read_excel(
+        buffer,
+        engine=engine,
+        usecols=list(col_mapping.values()),
+        dtype=dtype,
+        parse_dates=date_cols
+    )
+
+    info = {
+        'total_rows': len(df),
+        'columns': list(df.columns),
+        'col_mapping': col_mapping,
+        'preview': df.head(3)
+    }
+
+    # Create dictionary from dataframe (vectorized - no per-row Python loop)
+    sub = df[[col_mapping[key] for key in ('audience_name', 'audience_size', 'creation_date', 'refresh_date') if key in col_mapping]]
+    sub = sub.rename(columns={v: k for k, v in col_mapping.items()})
+    sub = sub.dropna(subset=['audience_name'])
+
+    names = sub['audience_name'].astype(str).to_numpy()
+
+    if 'audience_size' in sub.columns:
+        sizes = pd.to_numeric(sub['audience_size'], errors='coerce').fillna(0).astype('int64').to_numpy()
+    else:
+        sizes = [0] * len(names)
+
+    if 'creation_date' in sub.columns:
+        cdates = _format_dates(sub['creation_date'])
+    else:
+        cdates = [''] * len(names)
+
+    if 'refresh_date' in sub.columns:
+        rdates = _format_dates(sub['refresh_date'])
+    else:
+        rdates = [''] * len(names)
+
+    audience_dict = {
+        name: {'audienceSize': int(size), 'creationDate': cdate, 'refreshDate': rdate}
+        for name, size, cdate, rdate in zip(names, sizes, cdates, rdates)
+    }
+
+    return audience_dict, info
+
+@st.cache_data(show_spinner=False)
+def _parse_bytes(content, file_name):
+    """Parse raw Excel bytes into the audience dict (cached per upload).
+
+    Returns (audience_dict, info) where info carries the debug details the
+    UI shows. Raises ValueError when the file has no usable audience data.
+    """
+    # Prefer the Rust-based calamine reader when python-calamine is
+    # installed (much faster, handles .xls too)
+    try:
+        import python_calamine  # noqa: F401
+        return _parse_with_pandas(content, engine='calamine')
+    except ImportError:
+        pass
+
+    # Legacy .xls needs xlrd; for .xlsx, stream through openpyxl's
+    # read-only mode rather than loading the sheet into a DataFrame
+    if file_name.lower().endswith('.xls'):
+        return _parse_with_pandas(content, engine='xlrd')
+    return _parse_with_openpyxl(content)
+
 def process_excel(uploaded_file):
     """Process uploaded Excel file and extract audience data"""
     try:
-        # Read the Excel file
-        df = pd.read_excel(uploaded_file)
-        
+        # Parse from raw bytes so the heavy work is cached across reruns
+        content = uploaded_file.getvalue()
+        file_name = getattr(uploaded_file, 'name', '') or ''
+        audience_dict, info = _parse_bytes(content, file_name)
+
         # Show debug info
         st.write("**📋 File Info:**")
-        st.write(f"- Total rows: {len(df)}")
-        st.write(f"- Columns found: {list(df.columns)}")
-        
+        st.write(f"- Total rows: {info['total_rows']}")
+        st.write(f"- Columns found: {info['columns']}")
+
         # Show first few rows
         with st.expander("View first 3 rows of your file"):
-            st.dataframe(df.head(3))
-        
-        # Clean column names (strip whitespace and make case-insensitive matching)
-        df.columns = df.columns.str.strip()
-        
-        # Try to find the columns (case-insensitive)
-        col_mapping = {}
-        for col in df.columns:
-            col_lower = col.lower()
-            if 'audience name' in col_lower or col_lower == 'name':
-                col_mapping['audience_name'] = col
-            elif 'audience size' in col_lower or col_lower == 'size':
-                col_mapping['audience_size'] = col
-            elif 'creation date' in col_lower or 'created' in col_lower:
-                col_mapping['creation_date'] = col
-            elif 'refresh date' in col_lower or 'refreshed' in col_lower:
-                col_mapping['refresh_date'] = col
-        
-        st.write(f"**✅ Columns matched:** {col_mapping}")
-        
-        # Check if we found the audience name column
-        if 'audience_name' not in col_mapping:
-            st.error("❌ Could not find 'Audience Name' column. Please make sure your Excel file has a column named 'Audience Name'")
-            return None
-        
-        # Create dictionary from dataframe
-        audience_dict = {}
-        
-        for _, row in df.iterrows():
-            audience_name = row.get(col_mapping['audience_name'], None)
-            
-            if pd.notna(audience_name):
-                audience_dict[str(audience_name)] = {
-                    'audienceSize': int(row.get(col_mapping.get('audience_size', ''), 0)) if pd.notna(row.get(col_mapping.get('audience_size', ''), 0)) else 0,
-                    'creationDate': str(row.get(col_mapping.get('creation_date', ''), '')) if pd.notna(row.get(col_mapping.get('creation_date', ''), '')) else '',
-                    'refreshDate': str(row.get(col_mapping.get('refresh_date', ''), '')) if pd.notna(row.get(col_mapping.get('refresh_date', ''), '')) else ''
-                }
-        
+            st.dataframe(info['preview'])
+
+        st.write(f"**✅ Columns matched:** {info['col_mapping']}")
+
         if len(audience_dict) == 0:
             st.warning("⚠️ No valid audience data found. Check if 'Audience Name' column has data.")
             return None
-        
+
         st.write(f"**🎉 Successfully extracted {len(audience_dict)} audiences!**")
-        
+
         return audience_dict
-    
+
     except ImportError:
         st.error("⚠️ Missing dependency! Please install openpyxl:")
         st.code("pip install openpyxl")
         st.info("After installing, restart the Streamlit app.")
         return None
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return None
     except Exception as e:
         st.error(f"❌ Error processing file: {str(e)}")
         st.write("Full error details:")
         st.exception(e)
         return None
 
+def compute_delta(previous_dict, current_dict):
+    """Diff two audience dicts into added/removed records and size changes"""
+    # Short-circuit when one side is empty (e.g. the first real upload) -
+    # everything is added or removed, no set work needed
+    if not previous_dict:
+        return dict(current_dict), {}, {}
+    if not current_dict:
+        return {}, dict(previous_dict), {}
+
+    # Dict key views support set ops directly - no intermediate set copies
+    added = {name: current_dict[name] for name in current_dict.keys() - previous_dict.keys()}
+    removed = {name: previous_dict[name] for name in previous_dict.keys() - current_dict.keys()}
+
+    size_changes = {}
+    for name in current_dict.keys() & previous_dict.keys():
+        old_size = previous_dict[name]['audienceSize']
+        new_size = current_dict[name]['audienceSize']
+        if old_size != new_size:
+            size_changes[name] = (old_size, new_size)
+
+    return added, removed, size_changes
+
+def reconstruct_snapshot(upload_history, latest_dict, target_idx):
+    """Rebuild the full audience dict as of upload target_idx by replaying
+    the stored deltas backward from the latest upload"""
+    snapshot = {name: dict(data) for name, data in latest_dict.items()}
+
+    for entry in reversed(upload_history[target_idx + 1:]):
+        for name in entry['added']:
+            snapshot.pop(name, None)
+        for name, data in entry['removed'].items():
+            snapshot[name] = dict(data)
+        for name, (old_size, _) in entry['size_changes'].items():
+            if name in snapshot:
+                snapshot[name]['audienceSize'] = old_size
+
+    return snapshot
+
 def get_changes(upload_history):
     """Calculate additions and removals between last two uploads"""
     if len(upload_history) < 2:
         return [], []
-    
-    previous_dict = upload_history[-2]['data']
-    current_dict = upload_history[-1]['data']
-    
-    previous_names = set(previous_dict.keys())
-    current_names = set(current_dict.keys())
-    
-    added = list(current_names - previous_names)
-    removed = list(previous_names - current_names)
-    
-    return added, removed
+
+    latest = upload_history[-1]
+    return list(latest['added']), list(latest['removed'])
+
+@st.cache_data(show_spinner=False)
+def _audience_table(audience_dict):
+    """Build the display DataFrame for the table view (cached per dict)"""
+    df = pd.DataFrame.from_dict(audience_dict, orient='index')
+    df.index.name = 'Audience Name'
+
+    return df.reset_index().rename(columns={
+        'audienceSize': 'Audience Size',
+        'creationDate': 'Creation Date',
+        'refreshDate': 'Refresh Date'
+    })
+
+# Each view is a fragment so unrelated interactions elsewhere on the page
+# don't re-render these (potentially large) panels
+@st.fragment
+def render_json_view(audience_dict):
+    # Display as formatted JSON - one dumps call plus a plain code block is
+    # much lighter than the st.json tree widget on large dicts
+    st.code(json.dumps(audience_dict, indent=2, ensure_ascii=False), language="json")
+
+@st.fragment
+def render_table_view(audience_dict):
+    # Display as table
+    st.dataframe(_audience_table(audience_dict), use_container_width=True, hide_index=True)
+
+@st.fragment
+def render_dict_view(audience_dict):
+    # Display as formatted dictionary code (the JSON form is already valid
+    # Python for this schema - one dumps call instead of O(N^2) appends)
+    st.code(json.dumps(audience_dict, indent=4), language="python")
 
 def main_app():
     # Get current user's data
@@ -186,20 +444,43 @@ def main_app():
     )
     
     if uploaded_file is not None:
-        with st.spinner("Processing file..."):
-            new_audience_dict = process_excel(uploaded_file)
-            
+        # Skip exact re-uploads - same bytes means same dict, and appending
+        # it again would only grow the history with duplicates
+        content_hash = hashlib.blake2b(uploaded_file.getvalue(), digest_size=16).digest()
+        if content_hash == user_data.get('last_hash'):
+            st.info("ℹ️ This file is identical to your last upload - skipping.")
+        else:
+            with st.spinner("Processing file..."):
+                new_audience_dict = process_excel(uploaded_file)
+
             if new_audience_dict:
                 timestamp = datetime.now()
-                
-                # Store upload in user's private data
+
+                # Store only the delta against the previous upload - history
+                # stays small no matter how many full uploads come in
+                previous_dict = user_data.get('latest_dict', {})
+                added, removed, size_changes = compute_delta(previous_dict, new_audience_dict)
+
                 upload_history.append({
-                    'data': new_audience_dict,
                     'timestamp': timestamp,
-                    'count': len(new_audience_dict)
+                    'count': len(new_audience_dict),
+                    'added': added,
+                    'removed': removed,
+                    'size_changes': size_changes
                 })
-                
-                # Update user's data
+
+                # Track lifetime churn incrementally: which upload each
+                # audience first appeared in and was last present in
+                upload_idx = len(upload_history) - 1
+                first_seen = user_data.setdefault('first_seen', {})
+                last_seen = user_data.setdefault('last_seen', {})
+                for name in new_audience_dict:
+                    first_seen.setdefault(name, upload_idx)
+                    last_seen[name] = upload_idx
+
+                # Update user's data (latest_dict is the replay baseline)
+                user_data['latest_dict'] = new_audience_dict
+                user_data['last_hash'] = content_hash
                 update_user_data(upload_history, new_audience_dict)
                 
                 st.success(f"✅ Successfully uploaded {len(new_audience_dict)} audiences!")
@@ -217,51 +498,29 @@ def main_app():
             with col_add:
                 if added:
                     st.success(f"**✅ Added: {len(added)}**")
-                    for name in added:
-                        st.write(f"• {name}")
-            
+                    # One markdown call for the whole list - a single frontend
+                    # message instead of one per name
+                    st.markdown("\n".join(f"- {name}" for name in added))
+
             with col_rem:
                 if removed:
                     st.error(f"**❌ Removed: {len(removed)}**")
-                    for name in removed:
-                        st.write(f"• {name}")
+                    st.markdown("\n".join(f"- {name}" for name in removed))
             
             st.markdown("---")
     
     # Display dictionary
     if audience_dict:
         st.markdown("### 📖 Your Audience Dictionary")
-        
-        # Display as formatted JSON
-        with st.expander("View as JSON Format", expanded=True):
-            st.json(audience_dict)
-        
-        # Display as table
-        with st.expander("View as Data Table"):
-            table_data = []
-            for name, data in audience_dict.items():
-                table_data.append({
-                    'Audience Name': name,
-                    'Audience Size': data['audienceSize'],
-                    'Creation Date': data['creationDate'],
-                    'Refresh Date': data['refreshDate']
-                })
-            
-            df = pd.DataFrame(table_data)
-            st.dataframe(df, use_container_width=True, hide_index=True)
-        
-        # Display as formatted dictionary code
-        with st.expander("View as Python Dictionary"):
-            dict_str = "{\n"
-            for idx, (name, data) in enumerate(audience_dict.items()):
-                dict_str += f'    "{name}": {{\n'
-                dict_str += f'        "audienceSize": {data["audienceSize"]},\n'
-                dict_str += f'        "creationDate": "{data["creationDate"]}",\n'
-                dict_str += f'        "refreshDate": "{data["refreshDate"]}"\n'
-                dict_str += '    }' + (',' if idx < len(audience_dict) - 1 else '') + '\n'
-            dict_str += "}"
-            st.code(dict_str, language="python")
-        
+
+        json_tab, table_tab, dict_tab = st.tabs(["JSON Format", "Data Table", "Python Dictionary"])
+        with json_tab:
+            render_json_view(audience_dict)
+        with table_tab:
+            render_table_view(audience_dict)
+        with dict_tab:
+            render_dict_view(audience_dict)
+
         # Upload history
         if len(upload_history) > 1:
             st.markdown("---")
@@ -270,10 +529,15 @@ def main_app():
             for idx, upload in enumerate(upload_history):
                 with st.expander(f"Upload #{idx + 1} - {upload['count']} audiences - {upload['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}"):
                     if st.button(f"Load This Upload", key=f"view_{idx}"):
-                        update_user_data(upload_history, upload['data'])
+                        snapshot = reconstruct_snapshot(upload_history, user_data.get('latest_dict', {}), idx)
+                        update_user_data(upload_history, snapshot)
                         st.rerun()
-                    
-                    st.json(upload['data'])
+
+                    st.json({
+                        'added': upload['added'],
+                        'removed': upload['removed'],
+                        'size_changes': upload['size_changes']
+                    })
     else:
         st.info("👆 Upload an Excel file to get started!")
 